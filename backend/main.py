@@ -10,6 +10,7 @@ from slowapi.errors import RateLimitExceeded
 from typing import List, Optional
 from datetime import datetime
 from contextlib import asynccontextmanager
+import asyncio
 import json
 import csv
 import io
@@ -81,11 +82,13 @@ async def lifespan(app: FastAPI):
         from pathlib import Path
         
         # Add bin directory to path to access refresh_models.py (moved to bin/)
-        bin_path = Path(__file__).parent.parent / "bin"
-        sys.path.insert(0, str(bin_path))
+        bin_path = str(Path(__file__).parent.parent / "bin")
+        if bin_path not in sys.path:
+            sys.path.insert(0, bin_path)
         
         from refresh_models import refresh_models_if_needed
-        refresh_models_if_needed(max_age_hours=24)
+        # Provider discovery does blocking network I/O; keep it off the event loop
+        await asyncio.to_thread(refresh_models_if_needed, max_age_hours=24, background=True)
         logger.info("Model list refresh check complete")
         
     except Exception as e:
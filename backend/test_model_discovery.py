@@ -0,0 +1,260 @@
+"""
+Tests for the per-provider model discovery cache in bin/discover_models.py.
+"""
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+# The discovery scripts live in bin/, next to the backend
+bin_path = str(Path(__file__).parent.parent / "bin")
+if bin_path not in sys.path:
+    sys.path.insert(0, bin_path)
+
+import discover_models
+from discover_models import ModelDiscoveryService
+from refresh_models import should_refresh_models
+
+OPENAI_URL = "https://api.openai.com/v1/models"
+
+
+class FakeResponse:
+    """Minimal stand-in for requests.Response."""
+
+    def __init__(self, status_code=200, payload=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._payload = payload or {}
+
+    def json(self):
+        if isinstance(self._payload, Exception):
+            raise self._payload
+        return self._payload
+
+    def close(self):
+        pass
+
+
+def _iso(delta: timedelta) -> str:
+    return (datetime.now() + delta).isoformat()
+
+
+def _entry(models, delta, etag=None):
+    entry = {"models": models, "expires_at": _iso(delta)}
+    if etag:
+        entry["etag"] = etag
+    return entry
+
+
+@pytest.fixture
+def make_discovery(tmp_path, monkeypatch):
+    """Build a discovery service backed by a temp cache file and a fake OpenAI API."""
+    # Parse responses with .json() so FakeResponse needs no raw stream
+    monkeypatch.setattr(discover_models, "ijson", None)
+    requests_made = []
+
+    def make(cache_data, response):
+        cache_file = tmp_path / "available_models_cache.json"
+        cache_file.write_text(json.dumps(cache_data))
+
+        service = ModelDiscoveryService(cache_data=cache_data)
+        service.cache_file = cache_file
+        service._openai_headers = {"Authorization": "Bearer test-key"}
+
+        def fake_get(url, **kwargs):
+            requests_made.append((url, kwargs.get("headers", {})))
+            return response
+
+        service._get_with_retry = fake_get
+        return service
+
+    make.requests = requests_made
+    return make
+
+
+class TestModelDiscoveryCache:
+    """Test suite for the on-disk model cache."""
+
+    def test_legacy_cache_is_migrated_as_expired(self, make_discovery):
+        """A cache without per-provider entries keeps its models and ETags, expired."""
+        legacy = {
+            "timestamp": _iso(timedelta(minutes=-1)),
+            "models": {
+                "openai": ["gpt-4o"],
+                "anthropic": ["claude-sonnet-4-5"],
+                "ollama": ["llama3"],
+            },
+            "etags": {"openai": '"v1"'},
+        }
+        discovery = make_discovery(legacy, FakeResponse())
+
+        models, expired = discovery._load_cache()
+
+        assert models == legacy["models"]
+        assert sorted(expired) == ["anthropic", "ollama", "openai"]
+        assert discovery._get_cached_validator("openai") == ('"v1"', ["gpt-4o"])
+        assert discovery._get_cached_validator("ollama") == (None, [])
+
+    def test_partial_expiry_requeries_only_expired_providers(self, make_discovery):
+        """Only the expired provider is queried; fresh entries are kept as-is."""
+        fresh_anthropic = _entry(["claude-sonnet-4-5"], timedelta(hours=1))
+        fresh_ollama = _entry(["llama3"], timedelta(minutes=5))
+        cache_data = {
+            "timestamp": _iso(timedelta(hours=-7)),
+            "providers": {
+                "openai": _entry(["gpt-4"], timedelta(minutes=-1)),
+                "anthropic": fresh_anthropic,
+                "ollama": fresh_ollama,
+            },
+        }
+        response = FakeResponse(
+            payload={"data": [{"id": "gpt-4o"}, {"id": "whisper-1"}, {"id": "gpt-5.2"}]},
+            headers={"ETag": '"v2"'},
+        )
+        discovery = make_discovery(cache_data, response)
+
+        models = discovery.discover_all_models(background=False)
+
+        assert [url for url, _ in make_discovery.requests] == [OPENAI_URL]
+        assert models == {
+            "openai": ["gpt-5.2", "gpt-4o"],
+            "anthropic": ["claude-sonnet-4-5"],
+            "ollama": ["llama3"],
+        }
+
+        saved = json.loads(discovery.cache_file.read_text())["providers"]
+        assert saved["anthropic"] == fresh_anthropic
+        assert saved["ollama"] == fresh_ollama
+        assert saved["openai"]["models"] == ["gpt-5.2", "gpt-4o"]
+        assert saved["openai"]["etag"] == '"v2"'
+        assert saved["openai"]["catalog"] == ["gpt-4o", "gpt-5.2"]
+        assert datetime.fromisoformat(saved["openai"]["expires_at"]) > datetime.now()
+
+    def test_not_modified_refilters_cached_catalog(self, make_discovery):
+        """A 304 re-applies the current filter to the cached catalog and renews its expiry."""
+        catalog = ["gpt-4", "gpt-4o-mini", "gpt-4o"]
+        openai_entry = _entry(["gpt-4"], timedelta(minutes=-1), etag='"v1"')
+        openai_entry["catalog"] = catalog
+        cache_data = {
+            "timestamp": _iso(timedelta(hours=-7)),
+            "providers": {
+                "openai": openai_entry,
+                "anthropic": _entry(["claude-sonnet-4-5"], timedelta(hours=1)),
+                "ollama": _entry([], timedelta(minutes=5)),
+            },
+        }
+        discovery = make_discovery(cache_data, FakeResponse(status_code=304))
+
+        models = discovery.discover_all_models(background=False)
+
+        assert len(make_discovery.requests) == 1
+        _, headers = make_discovery.requests[0]
+        assert headers["If-None-Match"] == '"v1"'
+        assert models["openai"] == ["gpt-4o-mini", "gpt-4o"]
+
+        saved = json.loads(discovery.cache_file.read_text())["providers"]["openai"]
+        assert saved["models"] == ["gpt-4o-mini", "gpt-4o"]
+        assert saved["catalog"] == catalog
+        assert saved["etag"] == '"v1"'
+        assert datetime.fromisoformat(saved["expires_at"]) > datetime.now()
+
+    def test_cached_models_without_catalog_are_not_revalidated(self, make_discovery):
+        """Without the unfiltered catalog a 304 can't be re-filtered, so no ETag is sent."""
+        cache_data = {
+            "timestamp": _iso(timedelta(hours=-7)),
+            "providers": {
+                "openai": _entry(["gpt-4o"], timedelta(minutes=-1), etag='"v1"'),
+                "anthropic": _entry(["claude-sonnet-4-5"], timedelta(hours=1)),
+                "ollama": _entry([], timedelta(minutes=5)),
+            },
+        }
+        response = FakeResponse(payload={"data": [{"id": "gpt-4o"}]}, headers={"ETag": '"v2"'})
+        discovery = make_discovery(cache_data, response)
+
+        discovery.discover_all_models(background=False)
+
+        _, headers = make_discovery.requests[0]
+        assert "If-None-Match" not in headers
+
+    def test_parse_failure_does_not_cache_etag(self, make_discovery):
+        """A body that fails to parse falls back without keeping the response's ETag."""
+        cache_data = {
+            "timestamp": _iso(timedelta(hours=-7)),
+            "providers": {
+                "openai": _entry(["gpt-4o"], timedelta(minutes=-1), etag='"v1"'),
+                "anthropic": _entry(["claude-sonnet-4-5"], timedelta(hours=1)),
+                "ollama": _entry([], timedelta(minutes=5)),
+            },
+        }
+        cache_data["providers"]["openai"]["catalog"] = ["gpt-4o"]
+        response = FakeResponse(payload=ValueError("truncated body"), headers={"ETag": '"v2"'})
+        discovery = make_discovery(cache_data, response)
+
+        models = discovery.discover_all_models(background=False)
+
+        assert models["openai"] == list(discover_models._FALLBACK_OPENAI_MODELS)
+        saved = json.loads(discovery.cache_file.read_text())["providers"]["openai"]
+        assert saved["models"] == list(discover_models._FALLBACK_OPENAI_MODELS)
+        assert "etag" not in saved
+        assert "catalog" not in saved
+        assert discovery._get_cached_validator("openai") == (None, [])
+
+
+class TestShouldRefreshModels:
+    """Test suite for refresh_models.should_refresh_models."""
+
+    def _cache(self, *provider_deltas):
+        return {
+            "timestamp": _iso(timedelta(minutes=-10)),
+            "providers": {
+                provider: _entry([], delta)
+                for provider, delta in zip(("openai", "anthropic", "ollama"), provider_deltas)
+            },
+        }
+
+    def test_fresh_providers_skip_refresh(self):
+        """No refresh while the cache and every provider entry are fresh."""
+        cache_data = self._cache(timedelta(hours=6), timedelta(hours=24), timedelta(minutes=5))
+        assert should_refresh_models(24, cache_data) is False
+
+    def test_expired_provider_triggers_refresh(self):
+        """One expired provider entry is enough to refresh, even with a recent timestamp."""
+        cache_data = self._cache(timedelta(hours=6), timedelta(hours=24), timedelta(minutes=-1))
+        assert should_refresh_models(24, cache_data) is True
+
+    def test_invalid_expiry_triggers_refresh(self):
+        """An unparseable expires_at is treated as expired."""
+        cache_data = self._cache(timedelta(hours=6), timedelta(hours=24), timedelta(minutes=5))
+        cache_data["providers"]["ollama"]["expires_at"] = "not-a-date"
+        assert should_refresh_models(24, cache_data) is True
+
+    def test_old_timestamp_triggers_refresh(self):
+        """The overall max age still applies on top of provider expiry."""
+        cache_data = self._cache(timedelta(hours=6), timedelta(hours=24), timedelta(minutes=5))
+        cache_data["timestamp"] = _iso(timedelta(hours=-25))
+        assert should_refresh_models(24, cache_data) is True
+
+
+class TestOllamaPreflight:
+    """Test suite for the Ollama reachability check."""
+
+    @pytest.mark.parametrize("base_url, address", [
+        ("http://localhost:11434", ("localhost", 11434)),
+        ("https://ollama.example.com", ("ollama.example.com", 443)),
+        ("http://ollama.internal", ("ollama.internal", 80)),
+    ])
+    def test_preflight_uses_scheme_default_port(self, monkeypatch, base_url, address):
+        """A URL without a port is probed on its scheme's default port."""
+        probed = []
+
+        def refuse(addr, timeout):
+            probed.append(addr)
+            raise OSError("connection refused")
+
+        monkeypatch.setattr(discover_models.settings, "ollama_base_url", base_url, raising=False)
+        monkeypatch.setattr(discover_models.socket, "create_connection", refuse)
+
+        assert ModelDiscoveryService(cache_data={})._discover_ollama_models() == []
+        assert probed == [address]
@@ -4,25 +4,51 @@ Dynamic model discovery service for ContextPilot.
 Fetches available models from each AI provider and updates the system accordingly.
 """
 
+import asyncio
 import json
-import requests
-import subprocess
-from typing import Dict, List, Optional
+import logging
+import re
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime, timedelta
 from pathlib import Path
 import sys
 import os
+import signal
+import socket
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+try:
+    import fcntl
+except ImportError:  # Windows: refreshes are not serialized across processes
+    fcntl = None
+
+# requests and subprocess are imported lazily where they are used, so warm
+# runs that are served entirely from the cache don't pay for them
+_HERE = Path(__file__).resolve().parent
+_REPO_ROOT = _HERE.parent
+_CACHE_FILE = _REPO_ROOT / "available_models_cache.json"
+_FRONTEND_FILE = _REPO_ROOT / "frontend" / "src" / "model_options.json"
+_BACKEND_FILE = _REPO_ROOT / "backend" / "valid_models.json"
 
 # Add backend to path for imports
-backend_path = Path(__file__).parent.parent / "backend"
-sys.path.insert(0, str(backend_path))
+backend_path = _REPO_ROOT / "backend"
+if str(backend_path) not in sys.path:
+    sys.path.insert(0, str(backend_path))
 
 try:
     from config import settings
     from logger import logger
 except ImportError:
     # Fallback for when backend modules aren't available
-    print("⚠️  Backend modules not available, using basic configuration")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logger = logging.getLogger("contextpilot.discover_models")
+    logger.warning("⚠️  Backend modules not available, using basic configuration")
     
     class Settings:
         openai_api_key = os.environ.get('OPENAI_API_KEY', '')
@@ -30,468 +56,930 @@ except ImportError:
     
     settings = Settings()
 
+# The model cache is read on every startup, so use orjson when it is installed.
+# Frontend/backend model files stay on the stdlib encoder for stable diffs.
+try:
+    import orjson
+
+    def _dumps(data) -> bytes:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(data) -> bytes:
+        return json.dumps(data, indent=2).encode()
+
+    _loads = json.loads
+
+# Optional streaming parser for the OpenAI model catalog
+try:
+    import ijson
+    _IJSON_ERRORS: Tuple[type, ...] = (ijson.JSONError,)  # Not ValueError subclasses
+except ImportError:
+    ijson = None
+    _IJSON_ERRORS = ()
+
+# Chat model prefixes - future-proof for any GPT version
+# Include: gpt-*, chatgpt, o1, o3 (reasoning models)
+_CHAT_PREFIXES = ("gpt-", "chatgpt", "o1", "o3")
+
+# Fallback model lists used when API discovery fails or no key is configured.
+# Note: Keep these updated with the latest stable models.
+_FALLBACK_OPENAI_MODELS: Tuple[str, ...] = (
+    # GPT-5 series (latest generation)
+    "gpt-5.2",
+    "gpt-5",
+    "gpt-5-turbo",
+    # GPT-4 series
+    "gpt-4o",
+    "gpt-4o-mini",
+    "gpt-4-turbo",
+    "gpt-4",
+    # GPT-3.5 series
+    "gpt-3.5-turbo",
+)
+
+# Update when new Claude versions are released; as of Jan 2026,
+# Claude 4.5 models are the latest available
+_FALLBACK_ANTHROPIC_MODELS: Tuple[str, ...] = (
+    # Claude 4.5 series (Latest - 2025)
+    "claude-opus-4-5-20251101",
+    "claude-sonnet-4-5-20250929",
+    "claude-haiku-4-5-20251001",
+    
+    # Claude 4.5 aliases (auto-update to latest snapshot)
+    "claude-opus-4-5",
+    "claude-sonnet-4-5",
+    "claude-haiku-4-5",
+)
+
+# Default cache lifetime per provider; an upstream Cache-Control max-age wins.
+# Local Ollama models change on every `ollama pull`, OpenAI's catalog rarely.
+_PROVIDER_TTLS = {
+    "openai": timedelta(hours=6),
+    "anthropic": timedelta(hours=24),
+    "ollama": timedelta(minutes=5),
+}
+_MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+# Model ID prefixes kept after filtering: gpt-5.2, gpt-4o, reasoning and chatgpt models
+_KEEP_PREFIXES = ("gpt-5.2", "gpt-4o", "o1", "o3", "chatgpt")
+
+# Matches GPT version numbers, e.g. "5.2" from "gpt-5.2" or "5" from "gpt-5"
+_GPT_VERSION_RE = re.compile(r'gpt-(\d+)(?:\.(\d+))?')
+
+# Ports implied by an OLLAMA_BASE_URL scheme that doesn't name one
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Fail fast on unreachable hosts; read timeouts are set per provider
+DISCOVERY_CONNECT_TIMEOUT = float(os.environ.get('DISCOVERY_CONNECT_TIMEOUT', '2'))
+
+# API keys from the environment, read once at import
+_ENV_OPENAI_KEY = ''
+_ENV_ANTHROPIC_KEY = ''
+_ENV_ANTHROPIC_SDK_KEY = ''  # The Anthropic SDK's own ANTHROPIC_API_KEY
+
+
+def refresh_env_snapshot() -> None:
+    """Re-read the API key environment variables (e.g. after tests change them)."""
+    global _ENV_OPENAI_KEY, _ENV_ANTHROPIC_KEY, _ENV_ANTHROPIC_SDK_KEY
+    _ENV_OPENAI_KEY = os.environ.get('CONTEXTPILOT_OPENAI_API_KEY', '')
+    _ENV_ANTHROPIC_KEY = os.environ.get('CONTEXTPILOT_ANTHROPIC_API_KEY', '')
+    _ENV_ANTHROPIC_SDK_KEY = os.environ.get('ANTHROPIC_API_KEY', '')
+
+
+refresh_env_snapshot()
+
+
+def _parse_gpt_version(model_id: str) -> Optional[Tuple[int, int]]:
+    """Return (major, minor) for GPT model IDs, e.g. (5, 2) for "gpt-5.2"."""
+    gpt_match = _GPT_VERSION_RE.match(model_id)
+    if not gpt_match:
+        return None
+    return int(gpt_match.group(1)), int(gpt_match.group(2) or 0)
+
+
+def _openai_model_priority(model_id: str, version: Optional[Tuple[int, int]]) -> float:
+    """Sort priority for OpenAI chat models; lower values sort first (newer/better)."""
+    if version:
+        major_version, minor_version = version
+        # Higher version = higher priority (lower number)
+        # Use float-like priority: gpt-5.2 = 47.8, gpt-5 = 50, gpt-4 = 60
+        base_priority = (10 - major_version) * 10 - (minor_version * 0.2)
+        # Prefer 'o' variants and turbo
+        if 'o' in model_id and 'turbo' not in model_id:
+            return base_priority - 2
+        elif 'turbo' in model_id:
+            return base_priority - 1
+        else:
+            return base_priority
+    # Reasoning models (o1, o3) - high priority
+    elif model_id.startswith(('o1', 'o3')):
+        return 5
+    # ChatGPT models
+    elif 'chatgpt' in model_id:
+        return 100
+    else:
+        return 200
+
+
+def _select_openai_models(catalog: List[str]) -> List[str]:
+    """
+    Sort OpenAI chat model IDs by preference and keep the _KEEP_PREFIXES ones.
+    
+    Warns about GPT versions newer than the filter covers, so they can be
+    added to it.
+    """
+    chat_models = list(catalog)
+    
+    # Parse each GPT version once; it feeds both the sort priority
+    # and the newer-version check below
+    versions = {}
+    priorities = {}
+    for model_id in chat_models:
+        version = _parse_gpt_version(model_id)
+        versions[model_id] = version
+        priorities[model_id] = _openai_model_priority(model_id, version)
+    
+    # Sort models by preference (newer/better models first)
+    chat_models.sort(key=priorities.__getitem__)
+    
+    # Filter to keep only best general models: gpt-5.2, gpt-4o, and reasoning models
+    logger.info("🎯 Filtering to best general models: GPT-5.2, GPT-4o variants, and reasoning models")
+    
+    # Group every version (to spot newer models) while filtering
+    all_versions = defaultdict(list)
+    filtered_models = []
+    for model_id in chat_models:
+        version = versions[model_id]
+        if version:
+            all_versions[version].append(model_id)
+        if model_id.startswith(_KEEP_PREFIXES):
+            filtered_models.append(model_id)
+    
+    # Check for newer versions that were filtered out
+    newer_versions = [
+        (version, version_models)
+        for version, version_models in all_versions.items()
+        if version > (5, 2)  # Newer than gpt-5.2
+    ]
+    
+    # One single-line record per series: the backend logger may be
+    # a JSON formatter, which would escape embedded newlines
+    for (major, minor), models in sorted(newer_versions, reverse=True):
+        examples = ", ".join(models[:3])  # First 3 examples
+        if len(models) > 3:
+            examples += f", ... and {len(models) - 3} more"
+        logger.warning(
+            "🆕 Newer GPT-%d.%d models available but not included (%d models: %s); "
+            "update the filter in discover_models.py to include these",
+            major, minor, len(models), examples
+        )
+    
+    return filtered_models
+
+
+def _iter_model_ids(response: "requests.Response") -> Iterator[str]:
+    """
+    Yield model IDs from an OpenAI /v1/models response.
+    
+    With ijson installed the body is stream-parsed and only the "id" values
+    are built, so the rest of each catalog entry never becomes Python
+    objects; otherwise fall back to .json().
+    """
+    if ijson is None:
+        for model in response.json().get("data", []):
+            yield model.get("id", "")
+        return
+    
+    response.raw.decode_content = True  # Let urllib3 undo gzip encoding
+    yield from ijson.items(response.raw, "data.item.id")
+
+
+def _atomic_write_bytes(path: Path, payload: bytes) -> None:
+    """
+    Replace path with payload atomically.
+    
+    Writing to a sibling temp file and renaming it over the target means a
+    run killed mid-write leaves the previous file intact instead of a
+    truncated one that readers would reject. The temp name is unique so
+    concurrent writers (e.g. a background refresh) can't clobber each other.
+    """
+    try:
+        mode = path.stat().st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(payload)
+        # mkstemp creates the file 0600; keep the target's permissions
+        os.chmod(tmp_name, mode)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def _serialize_models(models: Dict[str, List[str]]) -> bytes:
+    """Serialize models for the frontend/backend model files."""
+    return json.dumps(models, indent=2).encode()
+
+
+def _write_if_changed(path: Path, payload: bytes) -> bool:
+    """
+    Write payload to path unless the file already holds identical bytes.
+    
+    Skipping no-op writes keeps mtimes stable, so dev-server file watchers
+    don't reload on every discovery run. Returns True if the file was written.
+    """
+    try:
+        if path.read_bytes() == payload:
+            return False
+    except FileNotFoundError:
+        pass
+    _atomic_write_bytes(path, payload)
+    return True
+
 
 class ModelDiscoveryService:
     """Service to discover available models from AI providers."""
     
-    def __init__(self):
-        self.cache_file = Path(__file__).parent.parent / "available_models_cache.json"
-        self.cache_ttl_hours = 24  # Cache models for 24 hours
+    def __init__(self, cache_data: Optional[dict] = None):
+        """
+        Create the service. ``cache_data`` is the already-parsed cache file,
+        for callers that read it themselves; it is read from disk otherwise.
+        """
+        self.cache_file = _CACHE_FILE
+        self.discovery_timeout = 15  # Per-provider timeout in seconds
+        self.cache_ttls: Dict[str, timedelta] = dict(_PROVIDER_TTLS)  # Per-provider cache lifetime
+        self._session = None  # Created on first HTTP request
+        self._session_lock = threading.Lock()
+        self._etags: Dict[str, str] = {}  # Validators for conditional refreshes
+        self._catalogs: Dict[str, List[str]] = {}  # Unfiltered model IDs the ETags cover
+        self._max_ages: Dict[str, int] = {}  # Upstream Cache-Control max-age
+        # Parsed once per process
+        self._cache_data = cache_data if cache_data is not None else self._read_cache_file()
         self._load_api_key_from_cache()
         
-    def discover_all_models(self) -> Dict[str, List[str]]:
-        """Discover available models from all providers."""
-        print("🔍 Discovering available models from all providers...")
+        # Built once, after a cached key may have been loaded into settings
+        self._openai_headers = {
+            "Authorization": f"Bearer {settings.openai_api_key}",
+            "Content-Type": "application/json"
+        } if settings.openai_api_key else None
         
-        models = {
-            "openai": [],
-            "anthropic": [],
-            "ollama": []
-        }
+    @staticmethod
+    def _create_session() -> "requests.Session":
+        """Create a pooled HTTP session shared by all provider lookups."""
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
         
-        # Try to load from cache first
-        cached_models = self._load_cache()
-        if cached_models:
-            print("📋 Using cached model list (still fresh)")
-            return cached_models
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=4,
+            # Transport errors are retried (and logged) by _get_with_retry.
+            # A 5xx that persists is returned rather than raised, so callers
+            # can tell a failing server from an unreachable one.
+            max_retries=Retry(total=2, connect=0, read=0, backoff_factor=0.3,
+                              status_forcelist=[500, 502, 503, 504],
+                              raise_on_status=False)
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
         
-        # Discover OpenAI models
-        try:
-            models["openai"] = self._discover_openai_models()
-        except Exception as e:
-            print(f"⚠️  OpenAI model discovery failed: {e}")
-            models["openai"] = self._get_fallback_openai_models()
-            
-        # Discover Anthropic models
+    def close(self) -> None:
+        """Close pooled HTTP connections."""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+    
+    def __enter__(self) -> "ModelDiscoveryService":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+        
+    def _get_session(self) -> "requests.Session":
+        """Return the shared HTTP session, creating it on first use."""
+        # Providers are queried from worker threads, so guard creation
+        with self._session_lock:
+            if self._session is None:
+                self._session = self._create_session()
+            return self._session
+        
+    def _get_with_retry(self, url: str, tries: int = 2, backoff: float = 0.25,
+                        **kwargs) -> "requests.Response":
+        """GET a URL, retrying transient connection errors and timeouts."""
+        import requests
+        
+        session = self._get_session()
+        for attempt in range(tries):
+            try:
+                return session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                logger.warning("⚠️  %s for %s (attempt %d/%d)",
+                               type(e).__name__, url, attempt + 1, tries)
+                if attempt == tries - 1:
+                    raise
+                time.sleep(backoff * 2 ** attempt)
+        
+    def discover_all_models(
+        self,
+        force_refresh: bool = False,
+        on_refresh: Optional[Callable[[Dict[str, List[str]]], None]] = None,
+        background: bool = False
+    ) -> Dict[str, List[str]]:
+        """
+        Discover available models from all providers.
+        
+        A fresh cache is returned as-is; for an expired one, only the expired
+        providers are queried again before returning. Long-lived processes
+        (the backend) can pass ``background=True`` to get the expired cache
+        back immediately while a daemon thread refreshes it (stale-while-
+        revalidate); ``on_refresh`` is called with the new models once that
+        finishes. A short-lived process would exit before that thread does,
+        so this is opt-in. ``force_refresh`` skips the cache and queries
+        every provider.
+        """
+        logger.info("🔍 Discovering available models from all providers...")
+        
+        if not force_refresh:
+            cached = self._load_cache()
+            if cached:
+                cached_models, expired = cached
+                if not expired:
+                    logger.info("📋 Using cached model list (still fresh)")
+                    return cached_models
+                
+                if not background:
+                    logger.info("📋 Cached models expired for %s, refreshing", ", ".join(expired))
+                    return self._refresh_and_save(on_refresh)
+                
+                logger.info("📋 Cached models expired for %s, "
+                            "using cached list while refreshing in background",
+                            ", ".join(expired))
+                threading.Thread(
+                    target=self._refresh_and_save,
+                    args=(on_refresh,),
+                    daemon=True
+                ).start()
+                return cached_models
+        
+        return self._refresh_and_save(force_refresh=force_refresh)
+    
+    def _refresh_and_save(
+        self,
+        on_refresh: Optional[Callable[[Dict[str, List[str]]], None]] = None,
+        force_refresh: bool = False
+    ) -> Dict[str, List[str]]:
+        """Query every provider, cache the results and notify on_refresh."""
+        # Single-flight: concurrent runs wait here instead of all hitting
+        # the provider APIs, then pick up the cache the winner wrote
+        with self._refresh_lock():
+            # Re-read from disk: another process may have refreshed the
+            # cache while we waited for the lock
+            self._cache_data = self._read_cache_file()
+            cached = None if force_refresh else self._load_cache()
+            if cached:
+                # Only re-query providers whose cached list has expired
+                models, expired = cached
+                if not expired:
+                    logger.info("📋 Model cache was refreshed by another process")
+            else:
+                models = {provider: [] for provider in self.cache_ttls}
+                expired = list(self.cache_ttls)
+            
+            if expired:
+                models.update(self._query_providers(expired))
+                self._save_cache(models, refreshed=expired)
+        
+        if on_refresh:
+            try:
+                on_refresh(models)
+            except Exception as e:
+                logger.warning("⚠️  Model refresh callback failed: %s", e)
+        
+        return models
+    
+    @contextmanager
+    def _refresh_lock(self, timeout: float = 30) -> Iterator[None]:
+        """Hold an exclusive lock on the cache file across processes."""
+        if fcntl is None:
+            yield
+            return
+        
+        lock_path = self.cache_file.with_suffix(self.cache_file.suffix + ".lock")
+        with open(lock_path, 'a') as lock_file:
+            deadline = time.monotonic() + timeout
+            locked = False
+            while not locked:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        logger.warning("⚠️  Timed out waiting for model cache lock, refreshing anyway")
+                        break
+                    time.sleep(0.1)
+            try:
+                yield
+            finally:
+                if locked:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _query_providers(self, providers: List[str]) -> Dict[str, List[str]]:
+        """Query the given providers concurrently, falling back per provider."""
         try:
-            models["anthropic"] = self._discover_anthropic_models()
-        except Exception as e:
-            print(f"⚠️  Anthropic model discovery failed: {e}")
-            models["anthropic"] = self._get_fallback_anthropic_models()
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._query_providers_async(providers))
+        
+        # Called synchronously from inside an event loop (e.g. backend
+        # startup): run the fan-out on its own loop in a helper thread
+        with ThreadPoolExecutor(max_workers=1) as runner:
+            return runner.submit(asyncio.run, self._query_providers_async(providers)).result()
+    
+    async def _query_providers_async(self, providers: List[str]) -> Dict[str, List[str]]:
+        """Gather all provider lookups on the event loop, mapping failures to fallbacks."""
+        discoverers = {
+            "openai": self._discover_openai_models,
+            "anthropic": self._discover_anthropic_models,
+            "ollama": self._discover_ollama_models,
+        }
+        fallbacks = {
+            "openai": self._get_fallback_openai_models,
+            "anthropic": self._get_fallback_anthropic_models,
+            "ollama": list,
+        }
+        
+        # Each lookup is network-bound, so total latency is bounded by the
+        # slowest provider rather than the sum. Native coroutines run on the
+        # loop; the blocking clients run on a private executor so a wedged
+        # provider can be abandoned on timeout (the loop's default executor
+        # would be joined by asyncio.run()).
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=len(providers))
+        
+        def start(provider: str):
+            discover = discoverers[provider]
+            if asyncio.iscoroutinefunction(discover):
+                return discover()
+            return loop.run_in_executor(executor, discover)
         
-        # Discover Ollama models
         try:
-            models["ollama"] = self._discover_ollama_models()
-        except Exception as e:
-            print(f"⚠️  Ollama model discovery failed: {e}")
-            models["ollama"] = []
-            
-        # Cache the results
-        self._save_cache(models)
+            results = await asyncio.gather(
+                *(
+                    asyncio.wait_for(start(provider), timeout=self.discovery_timeout)
+                    for provider in providers
+                ),
+                return_exceptions=True
+            )
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        models = {}
+        for provider, result in zip(providers, results):
+            if isinstance(result, BaseException):
+                if isinstance(result, asyncio.TimeoutError):
+                    result = f"timed out after {self.discovery_timeout}s"
+                logger.warning("⚠️  Model discovery failed for %s: %s", provider, result)
+                # Don't cache the fallback list under a validator for the real one
+                self._etags.pop(provider, None)
+                self._catalogs.pop(provider, None)
+                result = fallbacks[provider]()
+            models[provider] = result
         
         return models
     
     def _discover_openai_models(self) -> List[str]:
         """Discover available OpenAI models via API."""
-        if not settings.openai_api_key:
-            print("⚠️  No OpenAI API key configured, using fallback models")
+        if not self._openai_headers:
+            logger.warning("⚠️  No OpenAI API key configured, using fallback models")
             return self._get_fallback_openai_models()
             
-        print("🔍 Fetching OpenAI models...")
+        logger.info("🔍 Fetching OpenAI models...")
+        import requests
+        from urllib3.exceptions import HTTPError as Urllib3Error
         
-        headers = {
-            "Authorization": f"Bearer {settings.openai_api_key}",
-            "Content-Type": "application/json"
-        }
+        # Revalidate against the last response instead of re-downloading it.
+        # The ETag covers the whole catalog, so revalidation needs the
+        # unfiltered chat model IDs to re-apply the current filter to.
+        cached_etag, cached_catalog = self._get_cached_validator("openai", "catalog")
+        headers = self._openai_headers
+        if cached_etag:
+            headers = {**headers, "If-None-Match": cached_etag}
         
+        response = None
         try:
-            response = requests.get("https://api.openai.com/v1/models", headers=headers, timeout=10)
+            response = self._get_with_retry("https://api.openai.com/v1/models", headers=headers,
+                                            timeout=(DISCOVERY_CONNECT_TIMEOUT, 10),
+                                            stream=ijson is not None)
+            
+            self._record_max_age("openai", response)
+            if response.status_code == 304 and cached_etag:
+                self._etags["openai"] = cached_etag
+                self._catalogs["openai"] = cached_catalog
+                logger.info("📋 OpenAI models unchanged, reusing %d cached models", len(cached_catalog))
+                return _select_openai_models(cached_catalog)
             
             if response.status_code != 200:
                 raise Exception(f"OpenAI API error: {response.status_code}")
             
-            data = response.json()
-            
-            # Filter to chat models only and sort by capability/recency
-            chat_models = []
-            for model in data.get("data", []):
-                model_id = model.get("id", "")
-                
-                # Filter for chat models - future-proof for any GPT version
-                # Include: gpt-*, chatgpt, o1, o3 (reasoning models)
-                if (model_id.startswith("gpt-") or 
-                    model_id.startswith("chatgpt") or
-                    model_id.startswith("o1") or
-                    model_id.startswith("o3")):
-                    chat_models.append(model_id)
-            
-            # Sort models by preference (newer/better models first)
-            def model_priority(model_id):
-                # Extract version number for GPT models (e.g., "5.2" from "gpt-5.2", "5" from "gpt-5")
-                import re
-                gpt_match = re.match(r'gpt-(\d+)(?:\.(\d+))?', model_id)
-                if gpt_match:
-                    major_version = int(gpt_match.group(1))
-                    minor_version = int(gpt_match.group(2)) if gpt_match.group(2) else 0
-                    # Higher version = higher priority (lower number)
-                    # Use float-like priority: gpt-5.2 = 47.8, gpt-5 = 50, gpt-4 = 60
-                    base_priority = (10 - major_version) * 10 - (minor_version * 0.2)
-                    # Prefer 'o' variants and turbo
-                    if 'o' in model_id and 'turbo' not in model_id:
-                        return base_priority - 2
-                    elif 'turbo' in model_id:
-                        return base_priority - 1
-                    else:
-                        return base_priority
-                # Reasoning models (o1, o3) - high priority
-                elif model_id.startswith(('o1', 'o3')):
-                    return 5
-                # ChatGPT models
-                elif 'chatgpt' in model_id:
-                    return 100
-                else:
-                    return 200
-            
-            chat_models.sort(key=model_priority)
-            
-            # Check for newer models before filtering
-            import re
-            all_versions = {}
-            for model_id in chat_models:
-                gpt_match = re.match(r'gpt-(\d+)(?:\.(\d+))?', model_id)
-                if gpt_match:
-                    major = int(gpt_match.group(1))
-                    minor = int(gpt_match.group(2)) if gpt_match.group(2) else 0
-                    version_key = f"{major}.{minor}"
-                    if version_key not in all_versions:
-                        all_versions[version_key] = []
-                    all_versions[version_key].append(model_id)
-            
-            # Filter to keep only best general models: gpt-5.2, gpt-4o, and reasoning models
-            print(f"🎯 Filtering to best general models: GPT-5.2, GPT-4o variants, and reasoning models")
+            # Only recorded once the body has parsed: model IDs are read
+            # lazily below, and a fallback list must never be cached under
+            # this ETag, or every later 304 would keep serving it
+            etag = response.headers.get("ETag")
             
-            filtered_models = []
-            for model_id in chat_models:
-                # Keep gpt-5.2 variants
-                if model_id.startswith('gpt-5.2'):
-                    filtered_models.append(model_id)
-                # Keep gpt-4o variants
-                elif model_id.startswith('gpt-4o'):
-                    filtered_models.append(model_id)
-                # Keep reasoning models (o1, o3)
-                elif model_id.startswith(('o1', 'o3')):
-                    filtered_models.append(model_id)
-                # Keep chatgpt models
-                elif model_id.startswith('chatgpt'):
-                    filtered_models.append(model_id)
-            
-            # Check for newer versions that were filtered out
-            newer_versions = []
-            for version_key in all_versions.keys():
-                try:
-                    major, minor = map(int, version_key.split('.'))
-                    # Check if this is newer than gpt-5.2 (major > 5, or major == 5 and minor > 2)
-                    if major > 5 or (major == 5 and minor > 2):
-                        newer_versions.append((version_key, all_versions[version_key]))
-                except:
-                    pass
+            # Filter to chat models only
+            catalog = [model_id for model_id in _iter_model_ids(response)
+                       if model_id.startswith(_CHAT_PREFIXES)]
+            chat_models = _select_openai_models(catalog)
             
-            if newer_versions:
-                print("\n" + "⚠️ " * 20)
-                print("🆕 NEWER MODELS AVAILABLE BUT NOT INCLUDED:")
-                print("=" * 60)
-                for version, models in sorted(newer_versions, reverse=True):
-                    print(f"\n  GPT-{version} series ({len(models)} models):")
-                    for model in models[:3]:  # Show first 3 examples
-                        print(f"    • {model}")
-                    if len(models) > 3:
-                        print(f"    ... and {len(models) - 3} more")
-                print("\n💡 Update the filter in discover_models.py to include these")
-                print("=" * 60 + "\n")
-            
-            chat_models = filtered_models
-
-            
-            print(f"✅ Found {len(chat_models)} OpenAI chat models")
+            if etag:
+                self._etags["openai"] = etag
+                self._catalogs["openai"] = catalog
+            logger.info("✅ Found %d OpenAI chat models", len(chat_models))
             return chat_models
             
-        except Exception as e:
-            raise Exception(f"Failed to fetch OpenAI models: {e}")
+        except (requests.RequestException, Urllib3Error, ValueError, *_IJSON_ERRORS) as e:
+            # The body is parsed while it streams: .json() raises ValueError,
+            # ijson its own JSONError, and reading response.raw can raise
+            # urllib3 errors (read timeouts, dropped connections) directly
+            raise Exception(f"Failed to fetch OpenAI models: {e}") from e
+        finally:
+            if response is not None:
+                response.close()
     
     def _get_fallback_openai_models(self) -> List[str]:
         """Fallback OpenAI models when API discovery fails."""
-        print("\n" + "="*60)
-        print("⚠️  WARNING: Using fallback OpenAI model list!")
-        print("="*60)
-        print("Configure CONTEXTPILOT_OPENAI_API_KEY to discover models")
-        print("from the OpenAI API automatically. The fallback list may")
-        print("be outdated and missing newer models.")
-        print("="*60 + "\n")
-        
-        # Note: Keep this updated with latest stable models
-        return [
-            # GPT-5 series (latest generation)
-            "gpt-5.2",
-            "gpt-5",
-            "gpt-5-turbo",
-            # GPT-4 series
-            "gpt-4o",
-            "gpt-4o-mini", 
-            "gpt-4-turbo",
-            "gpt-4",
-            # GPT-3.5 series
-            "gpt-3.5-turbo",
-        ]
+        logger.warning(
+            "⚠️  WARNING: Using fallback OpenAI model list! "
+            "Configure CONTEXTPILOT_OPENAI_API_KEY to discover models "
+            "from the OpenAI API automatically. The fallback list may "
+            "be outdated and missing newer models."
+        )
+        
+        return list(_FALLBACK_OPENAI_MODELS)
     
-    def _discover_anthropic_models(self) -> List[str]:
+    async def _discover_anthropic_models(self) -> List[str]:
         """Discover Anthropic models via API."""
-        print("🔍 Discovering Anthropic models...")
+        logger.info("🔍 Discovering Anthropic models...")
         
         # Get API key
-        anthropic_key = os.environ.get('CONTEXTPILOT_ANTHROPIC_API_KEY') or \
-                       os.environ.get('ANTHROPIC_API_KEY') or \
+        anthropic_key = _ENV_ANTHROPIC_KEY or _ENV_ANTHROPIC_SDK_KEY or \
                        getattr(settings, 'anthropic_api_key', None)
         
         if not anthropic_key:
-            raise Exception("No Anthropic API key configured")
+            logger.warning("⚠️  No Anthropic API key configured, using fallback models")
+            return self._get_fallback_anthropic_models()
+        
+        try:
+            from anthropic import AnthropicError, AsyncAnthropic
+        except ImportError as e:
+            raise Exception(f"Failed to fetch Anthropic models: {e}") from e
         
         try:
-            from anthropic import Anthropic
-            
-            client = Anthropic(api_key=anthropic_key)
-            
             # List all available models
-            response = client.models.list()
-            
-            # Extract model IDs from response
-            all_models = []
-            if hasattr(response, 'data'):
-                for model in response.data:
-                    if hasattr(model, 'id'):
-                        all_models.append(model.id)
-                    elif hasattr(model, 'name'):
-                        all_models.append(model.name)
-                    elif isinstance(model, str):
-                        all_models.append(model)
-                    else:
-                        all_models.append(str(model))
-            
-            if not all_models:
-                raise Exception("No models returned from Anthropic API")
-            
-            print(f"✅ Found {len(all_models)} Anthropic models")
-            return all_models
-            
-        except Exception as e:
-            raise Exception(f"Failed to fetch Anthropic models: {e}")
+            async with AsyncAnthropic(api_key=anthropic_key) as client:
+                page = await client.models.list()
+        except AnthropicError as e:
+            raise Exception(f"Failed to fetch Anthropic models: {e}") from e
+        
+        # Extract model IDs from response
+        all_models = [
+            getattr(model, 'id', None) or getattr(model, 'name', None) or str(model)
+            for model in getattr(page, 'data', [])
+        ]
+        
+        if not all_models:
+            raise Exception("No models returned from Anthropic API")
+        
+        logger.info("✅ Found %d Anthropic models", len(all_models))
+        return all_models
     
     def _get_fallback_anthropic_models(self) -> List[str]:
         """Fallback Anthropic models when API discovery fails."""
-        print("\n" + "="*60)
-        print("⚠️  WARNING: Using fallback Anthropic model list!")
-        print("="*60)
-        print("Configure CONTEXTPILOT_ANTHROPIC_API_KEY to discover models")
-        print("from the Anthropic API automatically. The fallback list may")
-        print("be outdated and missing newer models.")
-        print("="*60 + "\n")
-        
-        # Note: Update this list when new Claude versions are released
-        # As of Jan 2026, Claude 4.5 models are the latest available
-        return [
-            # Claude 4.5 series (Latest - 2025)
-            "claude-opus-4-5-20251101",
-            "claude-sonnet-4-5-20250929",
-            "claude-haiku-4-5-20251001",
-            
-            # Claude 4.5 aliases (auto-update to latest snapshot)
-            "claude-opus-4-5",
-            "claude-sonnet-4-5",
-            "claude-haiku-4-5",
-        ]
+        logger.warning(
+            "⚠️  WARNING: Using fallback Anthropic model list! "
+            "Configure CONTEXTPILOT_ANTHROPIC_API_KEY to discover models "
+            "from the Anthropic API automatically. The fallback list may "
+            "be outdated and missing newer models."
+        )
+        
+        return list(_FALLBACK_ANTHROPIC_MODELS)
     
     def _discover_ollama_models(self) -> List[str]:
         """Discover locally installed Ollama models."""
-        print("🔍 Checking Ollama models...")
+        logger.info("🔍 Checking Ollama models...")
+        import requests
+        import subprocess
+        
+        # Cheap TCP preflight: when nothing listens on the Ollama port, both
+        # the API and the CLI (which talks to the same server) would fail
+        base_url = urlsplit(settings.ollama_base_url)
+        # An explicit scheme without a port (e.g. a reverse proxy) means
+        # that scheme's default port; only a bare host is Ollama's 11434
+        port = base_url.port or _DEFAULT_PORTS.get(base_url.scheme, 11434)
+        try:
+            socket.create_connection(
+                (base_url.hostname or "localhost", port),
+                timeout=0.2
+            ).close()
+        except OSError:
+            logger.warning("⚠️  Ollama not reachable at %s", settings.ollama_base_url)
+            return []
         
         try:
             # Try API approach first
             url = f"{settings.ollama_base_url}/api/tags"
-            response = requests.get(url, timeout=5)
+            cached_etag, cached_models = self._get_cached_validator("ollama")
+            headers = {"If-None-Match": cached_etag} if cached_etag else {}
+            response = self._get_with_retry(url, headers=headers, timeout=(DISCOVERY_CONNECT_TIMEOUT, 5))
+            
+            self._record_max_age("ollama", response)
+            if response.status_code == 304 and cached_etag:
+                self._etags["ollama"] = cached_etag
+                logger.info("📋 Ollama models unchanged, reusing %d cached models", len(cached_models))
+                return cached_models
             
             if response.status_code == 200:
                 data = response.json()
                 models = [model["name"] for model in data.get("models", [])]
-                print(f"✅ Found {len(models)} Ollama models via API")
+                if response.headers.get("ETag"):
+                    self._etags["ollama"] = response.headers["ETag"]
+                logger.info("✅ Found %d Ollama models via API", len(models))
                 return sorted(models)
-        except:
-            pass
-            
-        # Fallback to CLI approach
+            logger.warning("⚠️  Ollama API returned HTTP %d, trying CLI", response.status_code)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            # The CLI goes through the same server, so spawning it can't help
+            logger.warning("⚠️  Ollama API unreachable (%s)", type(e).__name__)
+            return []
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("⚠️  Unexpected Ollama API response (%s), trying CLI", e)
+        
+        # Fallback to CLI approach, only reached when the server answered
+        # but its API response was unusable
         try:
-            result = subprocess.run(
-                ["ollama", "list"],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+            result = self._run_ollama_list(timeout=5)
             
             if result.returncode == 0:
-                lines = result.stdout.strip().split("\n")[1:]  # Skip header
-                models = []
-                for line in lines:
-                    if line.strip():
-                        model_name = line.split()[0]  # First column is model name
-                        models.append(model_name)
+                lines = iter(result.stdout.splitlines())
+                next(lines, None)  # Skip header
+                # First column is model name
+                models = [line.partition(" ")[0] for line in lines if line.strip()]
                 
-                print(f"✅ Found {len(models)} Ollama models via CLI")
+                logger.info("✅ Found %d Ollama models via CLI", len(models))
                 return sorted(models)
             
         except (subprocess.TimeoutExpired, FileNotFoundError):
             pass
         
-        print("⚠️  Ollama not available or no models installed")
+        logger.warning("⚠️  Ollama not available or no models installed")
         return []
     
-    def _load_cache(self) -> Optional[Dict[str, List[str]]]:
-        """Load cached models if still fresh."""
-        if not self.cache_file.exists():
-            return None
-            
+    @staticmethod
+    def _run_ollama_list(timeout: float) -> "subprocess.CompletedProcess":
+        """Run `ollama list`, killing the whole process tree if it hangs."""
+        import subprocess
+        
+        if os.name == 'nt':
+            group_kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        else:
+            group_kwargs = {"start_new_session": True}
+        
+        process = subprocess.Popen(
+            ["ollama", "list"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            **group_kwargs
+        )
         try:
-            with open(self.cache_file, 'r') as f:
-                cache_data = json.load(f)
-                
-            cache_time = datetime.fromisoformat(cache_data.get("timestamp", ""))
-            if datetime.now() - cache_time > timedelta(hours=self.cache_ttl_hours):
-                print("📋 Model cache expired, refreshing...")
-                return None
-                
-            return cache_data.get("models", {})
-            
-        except Exception:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            # Killing only the direct child can leave a wedged grandchild
+            # holding the pipes open, so take down the whole group
+            if os.name == 'nt':
+                subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                               capture_output=True)
+            else:
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            process.kill()
+            process.communicate()
+            raise
+        
+        return subprocess.CompletedProcess(process.args, process.returncode, stdout, stderr)
+    
+    def _record_max_age(self, provider: str, response: "requests.Response") -> None:
+        """Remember an upstream Cache-Control max-age to use as the provider TTL."""
+        match = _MAX_AGE_RE.search(response.headers.get("Cache-Control", ""))
+        if match:
+            self._max_ages[provider] = int(match.group(1))
+    
+    def _read_cache_file(self) -> dict:
+        """Read and parse the cache file, or return {} if it is missing or invalid."""
+        try:
+            cache_data = _loads(self.cache_file.read_bytes())
+        except (OSError, ValueError):  # Missing file or corrupt JSON
+            return {}
+        return cache_data if isinstance(cache_data, dict) else {}
+    
+    def _read_cache_providers(self) -> Dict[str, dict]:
+        """Return the per-provider cache entries, regardless of age."""
+        cache_data = self._cache_data
+        providers = cache_data.get("providers")
+        if providers is None and cache_data.get("models"):
+            # Cache written before per-provider TTLs: keep its models and
+            # ETags, expired, so they can be served stale and revalidated
+            etags = cache_data.get("etags", {})
+            providers = {
+                provider: {
+                    "models": model_list,
+                    "expires_at": cache_data.get("timestamp", ""),
+                    "etag": etags.get(provider)
+                }
+                for provider, model_list in cache_data["models"].items()
+            }
+        return providers or {}
+    
+    def _load_cache(self) -> Optional[Tuple[Dict[str, List[str]], List[str]]]:
+        """Load cached models along with the providers whose entries have expired."""
+        providers = self._read_cache_providers()
+        if not providers:
             return None
+        
+        now = datetime.now()
+        models = {}
+        expired = []
+        for provider in self.cache_ttls:
+            entry = providers.get(provider) or {}
+            models[provider] = entry.get("models", [])
+            try:
+                if datetime.fromisoformat(entry.get("expires_at", "")) <= now:
+                    expired.append(provider)
+            except ValueError:
+                expired.append(provider)
+        
+        return models, expired
+    
+    def _get_cached_validator(self, provider: str,
+                              key: str = "models") -> Tuple[Optional[str], List[str]]:
+        """Return the cached ETag and model list (or ``key``) for a provider, regardless of age."""
+        entry = self._read_cache_providers().get(provider) or {}
+        etag = entry.get("etag")
+        models = entry.get(key) or []
+        # An ETag is only useful if we still have the body it validates
+        if not etag or not models:
+            return None, []
+        return etag, models
     
     def _load_api_key_from_cache(self) -> None:
         """Load API keys from cache if not set in environment."""
-        # Load OpenAI API key
-        env_openai_key = os.environ.get('CONTEXTPILOT_OPENAI_API_KEY', '')
-        if env_openai_key:
-            self.cached_openai_key = env_openai_key
-        else:
-            self.cached_openai_key = None
-            
-        # Load Anthropic API key
-        env_anthropic_key = os.environ.get('CONTEXTPILOT_ANTHROPIC_API_KEY', '')
-        if env_anthropic_key:
-            self.cached_anthropic_key = env_anthropic_key
-        else:
-            self.cached_anthropic_key = None
+        # Load API keys from the environment snapshot
+        self.cached_openai_key = _ENV_OPENAI_KEY or None
+        self.cached_anthropic_key = _ENV_ANTHROPIC_KEY or None
         
         # Try to load from cache if env vars not set
-        if not self.cache_file.exists():
-            return
+        cache_data = self._cache_data
         
-        try:
-            with open(self.cache_file, 'r') as f:
-                cache_data = json.load(f)
-            
-            # Load OpenAI key from cache if not in env
-            if not env_openai_key:
-                cached_openai = cache_data.get("openai_api_key", "")
-                if cached_openai:
-                    self.cached_openai_key = cached_openai
-                    settings.openai_api_key = cached_openai
-                    print("🔑 Using OpenAI API key from cache")
-            
-            # Load Anthropic key from cache if not in env
-            if not env_anthropic_key:
-                cached_anthropic = cache_data.get("anthropic_api_key", "")
-                if cached_anthropic:
-                    self.cached_anthropic_key = cached_anthropic
-                    settings.anthropic_api_key = cached_anthropic
-                    print("🔑 Using Anthropic API key from cache")
-        except Exception:
-            pass
+        # Load OpenAI key from cache if not in env
+        if not _ENV_OPENAI_KEY:
+            cached_openai = cache_data.get("openai_api_key", "")
+            if cached_openai:
+                self.cached_openai_key = cached_openai
+                settings.openai_api_key = cached_openai
+                logger.info("🔑 Using OpenAI API key from cache")
+        
+        # Load Anthropic key from cache if not in env
+        if not _ENV_ANTHROPIC_KEY:
+            cached_anthropic = cache_data.get("anthropic_api_key", "")
+            if cached_anthropic:
+                self.cached_anthropic_key = cached_anthropic
+                settings.anthropic_api_key = cached_anthropic
+                logger.info("🔑 Using Anthropic API key from cache")
     
-    def _save_cache(self, models: Dict[str, List[str]]) -> None:
-        """Save models to cache."""
+    def _save_cache(self, models: Dict[str, List[str]],
+                    refreshed: Optional[List[str]] = None) -> None:
+        """
+        Save models to cache.
+        
+        Providers in ``refreshed`` (all by default) get a new expiry from their
+        Cache-Control max-age or default TTL; the others keep their entries.
+        """
+        now = datetime.now()
+        previous = self._read_cache_providers()
+        providers = {}
+        for provider, model_list in models.items():
+            if refreshed is None or provider in refreshed or provider not in previous:
+                if provider in self._max_ages:
+                    ttl = timedelta(seconds=self._max_ages[provider])
+                else:
+                    ttl = self.cache_ttls[provider]
+                entry = {"models": model_list, "expires_at": (now + ttl).isoformat()}
+                if provider in self._etags:
+                    entry["etag"] = self._etags[provider]
+                if provider in self._catalogs:
+                    entry["catalog"] = self._catalogs[provider]
+                providers[provider] = entry
+            else:
+                providers[provider] = previous[provider]
+        
         cache_data = {
-            "timestamp": datetime.now().isoformat(),
-            "models": models
+            "timestamp": now.isoformat(),
+            "providers": providers
         }
         
-        # Store OpenAI API key
-        env_openai_key = os.environ.get('CONTEXTPILOT_OPENAI_API_KEY', '')
-        if env_openai_key:
-            cache_data["openai_api_key"] = env_openai_key
-        elif hasattr(self, 'cached_openai_key') and self.cached_openai_key:
-            cache_data["openai_api_key"] = self.cached_openai_key
-        
-        # Store Anthropic API key
-        env_anthropic_key = os.environ.get('CONTEXTPILOT_ANTHROPIC_API_KEY', '')
-        if env_anthropic_key:
-            cache_data["anthropic_api_key"] = env_anthropic_key
-        elif hasattr(self, 'cached_anthropic_key') and self.cached_anthropic_key:
-            cache_data["anthropic_api_key"] = self.cached_anthropic_key
+        # Store API keys (environment first, then keys loaded from the cache)
+        openai_key = _ENV_OPENAI_KEY or self.cached_openai_key
+        if openai_key:
+            cache_data["openai_api_key"] = openai_key
+        anthropic_key = _ENV_ANTHROPIC_KEY or self.cached_anthropic_key
+        if anthropic_key:
+            cache_data["anthropic_api_key"] = anthropic_key
         
         try:
-            with open(self.cache_file, 'w') as f:
-                json.dump(cache_data, f, indent=2)
-            print(f"💾 Cached models to {self.cache_file}")
-        except Exception as e:
-            print(f"⚠️  Failed to cache models: {e}")
+            _atomic_write_bytes(self.cache_file, _dumps(cache_data))
+            self._cache_data = cache_data
+            logger.info("💾 Cached models to %s", self.cache_file)
+        except (OSError, TypeError) as e:
+            logger.warning("⚠️  Failed to cache models: %s", e)
+    
+    def update_model_files(self, models: Dict[str, List[str]]) -> None:
+        """
+        Update the frontend and backend model files.
+        
+        The models are serialized once for both files, and each file is
+        only rewritten if its bytes on disk differ.
+        """
+        payload = _serialize_models(models)
+        self._write_model_file(_FRONTEND_FILE, payload, "frontend model options")
+        self._write_model_file(_BACKEND_FILE, payload, "backend model validation")
     
     def update_frontend_models(self, models: Dict[str, List[str]]) -> None:
         """Update frontend model options."""
-        frontend_file = Path(__file__).parent.parent / "frontend" / "src" / "model_options.json"
-        
-        try:
-            with open(frontend_file, 'w') as f:
-                json.dump(models, f, indent=2)
-            print(f"✅ Updated frontend model options: {frontend_file}")
-        except Exception as e:
-            print(f"⚠️  Failed to update frontend: {e}")
+        self._write_model_file(_FRONTEND_FILE, _serialize_models(models), "frontend model options")
     
     def update_backend_validation(self, models: Dict[str, List[str]]) -> None:
         """Update backend model validation."""
-        validation_file = Path(__file__).parent.parent / "backend" / "valid_models.json"
-        
+        self._write_model_file(_BACKEND_FILE, _serialize_models(models), "backend model validation")
+    
+    @staticmethod
+    def _write_model_file(path: Path, payload: bytes, description: str) -> None:
+        """Write a serialized model file, logging whether it changed."""
         try:
-            with open(validation_file, 'w') as f:
-                json.dump(models, f, indent=2)
-            print(f"✅ Updated backend model validation: {validation_file}")
-        except Exception as e:
-            print(f"⚠️  Failed to update backend validation: {e}")
+            if _write_if_changed(path, payload):
+                logger.info("✅ Updated %s: %s", description, path)
+            else:
+                logger.info("📋 No changes to %s: %s", description, path)
+        except OSError as e:
+            logger.warning("⚠️  Failed to update %s: %s", description, e)
 
 
 def main():
     """Main discovery process."""
-    print("🧭 ContextPilot Model Discovery Service")
-    print("=" * 50)
-    
-    discovery = ModelDiscoveryService()
+    print("🧭 ContextPilot Model Discovery Service\n" + "=" * 50)
     
-    # Discover models
-    models = discovery.discover_all_models()
+    with ModelDiscoveryService() as discovery:
+        # Discover models; an explicit run always wants current data
+        models = discovery.discover_all_models(force_refresh=True)
     
-    # Display results
-    print("\n📊 Model Discovery Results:")
-    print("=" * 30)
+    # Update system files
+    logger.info("🔄 Updating system configuration...")
+    discovery.update_model_files(models)
     
+    # The report is for the person running the script, so it is printed
+    # (in one write) rather than logged through the backend's formatter
+    report = ["", "📊 Model Discovery Results:", "=" * 30]
     for provider, model_list in models.items():
-        print(f"\n{provider.upper()}:")
+        report.append(f"\n{provider.upper()}:")
         if model_list:
-            for i, model in enumerate(model_list, 1):
-                print(f"  {i:2}. {model}")
+            report.extend(f"  {i:2d}. {model}" for i, model in enumerate(model_list, 1))
         else:
-            print("  (no models available)")
-    
-    # Update system files
-    print("\n🔄 Updating system configuration...")
-    discovery.update_frontend_models(models)
-    discovery.update_backend_validation(models)
+            report.append("  (no models available)")
     
-    # Generate summary
     total_models = sum(len(model_list) for model_list in models.values())
-    print(f"\n✅ Discovery complete! Found {total_models} total models")
-    print(f"   OpenAI: {len(models['openai'])} models")
-    print(f"   Anthropic: {len(models['anthropic'])} models") 
-    print(f"   Ollama: {len(models['ollama'])} models")
-    
-    print("\n💡 Next steps:")
-    print("   • Restart backend to use updated model validation")
-    print("   • Restart frontend to show new model options")
-    print("   • Re-run this script daily or when adding new models")
+    report += [
+        f"\n✅ Discovery complete! Found {total_models} total models",
+        f"   OpenAI: {len(models['openai'])} models",
+        f"   Anthropic: {len(models['anthropic'])} models",
+        f"   Ollama: {len(models['ollama'])} models",
+        "",
+        "💡 Next steps:",
+        "   • Restart backend to use updated model validation",
+        "   • Restart frontend to show new model options",
+        "   • Re-run this script daily or when adding new models",
+    ]
+    sys.stdout.write("\n".join(report) + "\n")
 
 
 if __name__ == "__main__":
@@ -8,42 +8,76 @@ import sys
 from pathlib import Path
 from datetime import datetime, timedelta
 import json
+from typing import Optional
 
-def should_refresh_models(max_age_hours: int = 24) -> bool:
+_BIN_DIR = Path(__file__).resolve().parent
+_REPO_ROOT = _BIN_DIR.parent
+_CACHE_FILE = _REPO_ROOT / "available_models_cache.json"
+
+# Make discover_models importable however this module was loaded; checked
+# once here so repeated refreshes don't keep growing sys.path
+if str(_BIN_DIR) not in sys.path:
+    sys.path.insert(0, str(_BIN_DIR))
+
+from discover_models import ModelDiscoveryService
+
+def read_cache_data() -> Optional[dict]:
+    """Read the model cache, or return None if it is missing or unreadable."""
+    try:
+        with open(_CACHE_FILE, 'r') as f:
+            cache_data = json.load(f)
+    except (OSError, ValueError):  # ValueError covers bad JSON and bad UTF-8
+        return None
+    return cache_data if isinstance(cache_data, dict) else None
+
+def should_refresh_models(max_age_hours: int = 24, cache_data: Optional[dict] = None) -> bool:
     """Check if models should be refreshed based on cache age."""
-    cache_file = Path(__file__).parent.parent / "available_models_cache.json"
+    if cache_data is None:
+        cache_data = read_cache_data()
     
-    if not cache_file.exists():
+    if not cache_data:
         return True
         
     try:
-        with open(cache_file, 'r') as f:
-            cache_data = json.load(f)
-            
         cache_time = datetime.fromisoformat(cache_data.get("timestamp", ""))
         if datetime.now() - cache_time > timedelta(hours=max_age_hours):
             return True
+        
+        # Each provider also carries its own expiry (e.g. short-lived Ollama lists)
+        for entry in cache_data.get("providers", {}).values():
+            if datetime.fromisoformat(entry.get("expires_at", "")) <= datetime.now():
+                return True
             
-    except (json.JSONDecodeError, KeyError, ValueError):
+    except (KeyError, ValueError):
         return True
         
     return False
 
-def refresh_models_if_needed(max_age_hours: int = 24, force: bool = False) -> bool:
-    """Refresh models if cache is stale or force is True."""
-    if force or should_refresh_models(max_age_hours):
+def refresh_models_if_needed(max_age_hours: int = 24, force: bool = False,
+                             background: bool = False) -> bool:
+    """
+    Refresh models if cache is stale or force is True.
+    
+    With ``background`` (for the long-lived backend process) a stale cache is
+    served right away and refreshed on a background thread; otherwise the
+    refresh completes before this returns.
+    """
+    # Read the cache once and hand it to the discovery service as well
+    cache_data = read_cache_data()
+    if force or should_refresh_models(max_age_hours, cache_data):
         print("🔄 Refreshing model list...")
         
         try:
-            # Import and run model discovery
-            sys.path.insert(0, str(Path(__file__).parent.parent))
-            from bin.discover_models import ModelDiscoveryService
-            
-            discovery = ModelDiscoveryService()
-            models = discovery.discover_all_models()
+            discovery = ModelDiscoveryService(cache_data=cache_data or {})
             
-            discovery.update_frontend_models(models)
-            discovery.update_backend_validation(models)
+            # In the background, a stale cache is served immediately and
+            # the refresh rewrites the model files again once it completes
+            models = discovery.discover_all_models(
+                force_refresh=force,
+                on_refresh=discovery.update_model_files if background else None,
+                background=background
+            )
+            discovery.update_model_files(models)
             
             total_models = sum(len(model_list) for model_list in models.values())
             print(f"✅ Model refresh complete! {total_models} models available")
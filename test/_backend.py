@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Shared helper for the test scripts that need a running backend server.
+"""
+
+import atexit
+import functools
+import os
+import select
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+import httpx
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent starts are not serialized
+    fcntl = None
+
+BACKEND_DIR = Path(__file__).parent.parent / "backend"
+HOST = "127.0.0.1"
+PORT = 8000
+BASE_URL = f"http://{HOST}:{PORT}"
+
+# uvicorn[standard] already picks uvloop and httptools when available
+UVICORN_ARGS = [
+    "-m", "uvicorn", "main:app",
+    "--host", HOST, "--port", str(PORT),
+    "--log-level", "warning"
+]
+
+# Opt-in reuse: with --reuse-backend (or CONTEXTPILOT_REUSE_BACKEND=1) the
+# backend is left running at exit, and the next script reuses it while its
+# pidfile is younger than CACHE_TTL seconds. By default each run starts its
+# own server and stops it again.
+REUSE_FLAG = "--reuse-backend"
+REUSE_ENV = "CONTEXTPILOT_REUSE_BACKEND"
+PIDFILE = Path(tempfile.gettempdir()) / "contextpilot_backend.pid"
+CACHE_TTL = 60
+
+# One pooled client for all test requests, so they share keep-alive
+# connections instead of forking curl and reconnecting each time
+client = httpx.Client(
+    base_url=BASE_URL,
+    timeout=30,
+    limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=30)
+)
+
+
+class Backend:
+    """A backend server started (or reused) by start_backend()."""
+
+    def __init__(self, pid: int, process: Optional[subprocess.Popen] = None,
+                 keep_running: bool = False):
+        self.pid = pid
+        self.process = process
+        self.keep_running = keep_running
+
+
+def _open_process_handle(process: subprocess.Popen) -> Optional[int]:
+    """Return a pidfd that becomes readable when the process exits, if supported."""
+    pidfd_open = getattr(os, "pidfd_open", None)  # Linux 5.3+, Python 3.9+
+    if pidfd_open is None:
+        return None
+    try:
+        return pidfd_open(process.pid)
+    except OSError:
+        return None
+
+
+def _wait_exit(process: subprocess.Popen, timeout: float) -> bool:
+    """Wait up to timeout for the process to exit, without polling if possible."""
+    pidfd = _open_process_handle(process)
+    if pidfd is None:
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return False
+        return True
+
+    try:
+        readable, _, _ = select.select([pidfd], [], [], timeout)
+        return bool(readable)
+    finally:
+        os.close(pidfd)
+
+
+def _signal_group(pid: int, sig: int) -> None:
+    """Signal the backend's whole process group (it leads its own session)."""
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(pid, sig)
+        else:
+            os.kill(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _terminate(process: subprocess.Popen, timeout: float = 5) -> None:
+    """Stop a backend we started: SIGTERM, then SIGKILL if it doesn't exit in time."""
+    _signal_group(process.pid, signal.SIGTERM)
+    if not _wait_exit(process, timeout):
+        print(f"⚠️  Backend ignored SIGTERM for {timeout:g}s, killing it")
+        _signal_group(process.pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+        _wait_exit(process, 2)
+    process.wait(timeout=1)  # Reap the exit status
+
+
+def wait_for_backend(process: subprocess.Popen, timeout: float = 30) -> bool:
+    """
+    Wait until the backend accepts TCP connections on PORT.
+
+    Uvicorn only binds its socket after application startup has finished,
+    so an accepted connection means the server is ready. Between probes
+    the child process is watched through a pidfd, so a backend that
+    crashes during startup is noticed immediately instead of after the
+    full timeout.
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.01  # Retry backoff: 10ms, 20ms, 40ms, ... capped at 250ms
+    pidfd = _open_process_handle(process)
+
+    try:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                return False
+
+            if _port_open(timeout=0.2):
+                return True
+
+            # Connection refused: nothing is listening yet. Back off, but
+            # wake straight away if the child exits in the meantime.
+            wait = min(delay, max(0, deadline - time.monotonic()))
+            if pidfd is not None:
+                readable, _, _ = select.select([pidfd], [], [], wait)
+                if readable:
+                    return False
+            else:
+                time.sleep(wait)
+            delay = min(delay * 2, 0.25)
+
+        return False
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _is_our_backend(pid: int) -> bool:
+    """
+    Check that pid is still a backend started by _launch_backend().
+
+    The pidfile can outlive its server, and the pid may since have been
+    reused by an unrelated process. Without /proc to confirm the command
+    line, the pid is never treated as ours.
+    """
+    try:
+        cmdline = Path(f"/proc/{pid}/cmdline").read_bytes()
+    except OSError:
+        return False
+    args = [arg.decode(errors="replace") for arg in cmdline.split(b"\0") if arg]
+    return args[1:] == UVICORN_ARGS  # args[0] is whichever interpreter ran it
+
+
+def _port_open(timeout: float = 0.5) -> bool:
+    try:
+        socket.create_connection((HOST, PORT), timeout=timeout).close()
+    except OSError:
+        return False
+    return True
+
+
+def _stop_pid(pid: int, timeout: float = 5) -> None:
+    """Terminate a backend that is not our child and wait for it to go away."""
+    _signal_group(pid, signal.SIGTERM)
+    deadline = time.monotonic() + timeout
+    while _pid_alive(pid):
+        if time.monotonic() >= deadline:
+            if _is_our_backend(pid):  # Still the same server, not a reused pid
+                _signal_group(pid, signal.SIGKILL)
+            break
+        time.sleep(0.05)
+
+
+def _cached_backend() -> Optional[Backend]:
+    """Return the backend from a previous run if it is fresh and still serving."""
+    try:
+        pid = int(PIDFILE.read_text().strip())
+        age = time.time() - PIDFILE.stat().st_mtime
+    except (OSError, ValueError):
+        return None
+
+    if not _is_our_backend(pid):
+        # The server is gone (or the pid now belongs to someone else):
+        # forget it, but never signal a process we can't vouch for
+        PIDFILE.unlink(missing_ok=True)
+        return None
+
+    if age < CACHE_TTL and _port_open():
+        PIDFILE.touch()  # Extend the TTL for the next script
+        return Backend(pid, keep_running=True)
+
+    # Too old or unhealthy: shut it down so a fresh one can bind the port
+    _stop_pid(pid)
+    PIDFILE.unlink(missing_ok=True)
+    return None
+
+
+@contextmanager
+def _start_lock() -> Iterator[None]:
+    """Hold an exclusive lock next to the pidfile while starting a backend."""
+    if fcntl is None:
+        yield
+        return
+    with open(PIDFILE.with_suffix(".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def reuse_requested(flag: bool = False) -> bool:
+    """Whether backend reuse was asked for by a flag or REUSE_ENV."""
+    return flag or os.environ.get(REUSE_ENV, "") not in ("", "0")
+
+
+def start_backend(timeout: float = 30, use_cache: bool = False) -> Optional[Backend]:
+    """
+    Start the backend server and wait until it is ready.
+
+    With ``use_cache`` a backend left running by a previous script is reused,
+    and the one started here is left running for the next script.
+    """
+    if not use_cache:
+        return _launch_backend(timeout, use_cache=False)
+
+    # Concurrent callers (e.g. pytest-xdist workers) take turns, so only the
+    # first one starts a server and the rest reuse it through the pidfile
+    with _start_lock():
+        backend = _cached_backend()
+        if backend:
+            print(f"♻️  Reusing running backend (pid {backend.pid})")
+            return backend
+        return _launch_backend(timeout, use_cache=True)
+
+
+def _launch_backend(timeout: float, use_cache: bool) -> Optional[Backend]:
+    cmd = [sys.executable, *UVICORN_ARGS]
+
+    print("🚀 Starting backend server...")
+    env = os.environ.copy()
+    env["PYTHONPATH"] = str(BACKEND_DIR)
+    # Nobody reads the server's output, and an undrained pipe would stall it
+    # once full. Its own session lets teardown signal the whole group, and
+    # keeps the terminal's Ctrl-C away from a cached backend.
+    process = subprocess.Popen(
+        cmd,
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+
+    if wait_for_backend(process, timeout):
+        print("✅ Backend is ready!")
+        if use_cache:
+            PIDFILE.write_text(str(process.pid))
+        return Backend(process.pid, process, keep_running=use_cache)
+
+    print("❌ Backend failed to start")
+    _terminate(process)
+    return None
+
+
+def stop_backend(backend: Backend) -> None:
+    """Stop the backend, unless it is cached for the next script."""
+    client.close()
+    if backend.keep_running:
+        print(f"♻️  Leaving backend running for reuse (pid {backend.pid})")
+        return
+
+    print("\n🛑 Stopping backend server...")
+    _terminate(backend.process)
+    print("✅ Backend stopped")
+
+
+@functools.lru_cache(maxsize=1)
+def get_backend(timeout: float = 30, use_cache: bool = False) -> Optional[Tuple[Backend, str]]:
+    """
+    Return ``(backend, base_url)`` for this process, starting the server once.
+
+    Every caller in the process shares the same backend; it is stopped (or
+    left cached) by a single stop_backend() call at interpreter exit.
+    """
+    backend = start_backend(timeout, use_cache)
+    if backend is None:
+        return None
+    atexit.register(stop_backend, backend)
+    return backend, BASE_URL
@@ -0,0 +1,38 @@
+"""
+Pytest fixtures for the backend test scripts.
+
+The scripts still run standalone; under pytest they share one backend for
+the whole session, which is stopped when the session ends. Pass
+``--reuse-backend`` (or set CONTEXTPILOT_REUSE_BACKEND=1) to leave it
+running for the next session instead; this is also what lets pytest-xdist
+workers (``pytest -n auto --dist=loadscope --reuse-backend``) share one
+backend through the pidfile cache.
+"""
+import httpx
+import pytest
+
+from _backend import REUSE_FLAG, get_backend, reuse_requested
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        REUSE_FLAG, action="store_true",
+        help="Reuse a running backend and leave it running for the next session"
+    )
+
+
+@pytest.fixture(scope="session")
+def backend(request):
+    """Start (or reuse) the backend server once per session."""
+    started = get_backend(use_cache=reuse_requested(request.config.getoption(REUSE_FLAG)))
+    if not started:
+        pytest.fail("Backend failed to start")
+    _, base_url = started
+    return base_url
+
+
+@pytest.fixture(scope="session")
+def client(backend):
+    """HTTP client with keep-alive connections to the session backend."""
+    with httpx.Client(base_url=backend, timeout=30) as session_client:
+        yield session_client
@@ -60,11 +60,14 @@ def test_model_files():
         print("✅ Frontend and backend model lists match")
     else:
         print("⚠️  Frontend and backend model lists differ")
-        for provider in set(frontend_models.keys()) | set(backend_models.keys()):
-            f_models = set(frontend_models.get(provider, []))
-            b_models = set(backend_models.get(provider, []))
+        f_sets = {provider: set(models) for provider, models in frontend_models.items()}
+        b_sets = {provider: set(models) for provider, models in backend_models.items()}
+        
+        for provider in f_sets.keys() | b_sets.keys():
+            f_models = f_sets.get(provider, set())
+            b_models = b_sets.get(provider, set())
             
-            if f_models != b_models:
+            if f_models ^ b_models:
                 print(f"   {provider}:")
                 if f_models - b_models:
                     print(f"     Frontend only: {list(f_models - b_models)}")
@@ -3,96 +3,96 @@
 Comprehensive test to show model selection works correctly now.
 """
 
+import asyncio
 import json
-import subprocess
-import time
-from pathlib import Path
 import sys
 
-def start_backend():
-    """Start backend with proper error handling."""
-    backend_dir = Path(__file__).parent.parent / "backend"
-    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "0.0.0.0", "--port", "8000"]
-    
-    env = {"PYTHONPATH": str(backend_dir)}
-    process = subprocess.Popen(
-        cmd, cwd=backend_dir, env={**dict(subprocess.os.environ), **env},
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE
-    )
-    
-    # Wait for server
-    for i in range(20):
-        try:
-            result = subprocess.run(["curl", "-s", "http://localhost:8000/health"], 
-                                  capture_output=True, timeout=2)
-            if result.returncode == 0:
-                print("✅ Backend ready!")
-                return process
-        except:
-            pass
-        time.sleep(1)
+import httpx
+
+import pytest
+
+from _backend import BASE_URL, REUSE_FLAG, get_backend, reuse_requested
+
+# Test multiple models
+TEST_CASES = [
+    {"model": "gpt-4o", "should_work": True, "description": "GPT-4o (Latest)"},
+    {"model": "gpt-4", "should_work": True, "description": "GPT-4 Classic"},
+    {"model": "gpt-3.5-turbo", "should_work": True, "description": "GPT-3.5 Turbo"},
+]
+
+# Only the model differs between requests, so encode each body once up front
+BODY_TEMPLATE = {"task": "What model are you? Answer in 5 words max.", 
+                 "provider": "openai", "model": None}
+CHAT_BODIES = {
+    test_case["model"]: json.dumps({**BODY_TEMPLATE, "model": test_case["model"]}).encode()
+    for test_case in TEST_CASES
+}
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+def check_selection_response(test_case: dict, result) -> bool:
+    """Check one /ai/chat response (or request exception) against its test case."""
+    model = test_case["model"]
     
-    process.terminate()
-    return None
+    if isinstance(result, Exception):
+        print(f"❌ Request failed: {result}")
+        return False
+        
+    try:
+        data = result.json()
+        if "error_code" in data:
+            if test_case["should_work"]:
+                print(f"❌ Expected success but got error: {data['message']}")
+                return False
+            print(f"✅ Correctly rejected: {data['message']}")
+            return True
+        
+        returned_model = data.get("model", "unknown")
+        response = data.get("response", "")
+        
+        if returned_model == model:
+            print(f"✅ Correct model used: {returned_model}")
+            print(f"   Response: {response}")
+            return True
+        
+        print(f"❌ Wrong model! Requested: {model}, Got: {returned_model}")
+        print(f"   Response: {response}")
+        return False
+                
+    except json.JSONDecodeError as e:
+        print(f"❌ Invalid response: {e}")
+        return False
 
-def test_model_selection():
+async def check_model_selection() -> bool:
     """Test that model selection works correctly."""
     print("🧪 Testing Model Selection")
     print("=" * 40)
     
-    # Test multiple models
-    test_cases = [
-        {"model": "gpt-4o", "should_work": True, "description": "GPT-4o (Latest)"},
-        {"model": "gpt-4", "should_work": True, "description": "GPT-4 Classic"},
-        {"model": "gpt-3.5-turbo", "should_work": True, "description": "GPT-3.5 Turbo"},
-    ]
+    # The requests are independent, so send them together and wait for the
+    # slowest model instead of the sum of all of them
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=30) as async_client:
+        responses = await asyncio.gather(
+            *(async_client.post("/ai/chat", content=CHAT_BODIES[test_case["model"]],
+                                headers=JSON_HEADERS)
+              for test_case in TEST_CASES),
+            return_exceptions=True
+        )
     
     results = []
-    
-    for i, test_case in enumerate(test_cases, 1):
-        model = test_case["model"]
-        print(f"\n{i}️⃣ Testing {test_case['description']} ({model})")
-        
-        cmd = ["curl", "-s", "-X", "POST", "http://localhost:8000/ai/chat",
-               "-H", "Content-Type: application/json",
-               "-d", json.dumps({"task": f"What model are you? Answer in 5 words max.", 
-                               "provider": "openai", "model": model})]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            print(f"❌ Request failed: {result.stderr}")
-            results.append(False)
-            continue
-            
-        try:
-            data = json.loads(result.stdout)
-            if "error_code" in data:
-                if test_case["should_work"]:
-                    print(f"❌ Expected success but got error: {data['message']}")
-                    results.append(False)
-                else:
-                    print(f"✅ Correctly rejected: {data['message']}")
-                    results.append(True)
-            else:
-                returned_model = data.get("model", "unknown")
-                response = data.get("response", "")
-                
-                if returned_model == model:
-                    print(f"✅ Correct model used: {returned_model}")
-                    print(f"   Response: {response}")
-                    results.append(True)
-                else:
-                    print(f"❌ Wrong model! Requested: {model}, Got: {returned_model}")
-                    print(f"   Response: {response}")
-                    results.append(False)
-                    
-        except json.JSONDecodeError as e:
-            print(f"❌ Invalid response: {e}")
-            results.append(False)
+    for i, (test_case, result) in enumerate(zip(TEST_CASES, responses), 1):
+        print(f"\n{i}️⃣ Testing {test_case['description']} ({test_case['model']})")
+        results.append(check_selection_response(test_case, result))
     
     return all(results)
 
+@pytest.mark.parametrize("test_case", TEST_CASES, ids=[tc["model"] for tc in TEST_CASES])
+def test_model_selection(client, test_case):
+    try:
+        result = client.post("/ai/chat", content=CHAT_BODIES[test_case["model"]],
+                             headers=JSON_HEADERS)
+    except httpx.HTTPError as e:
+        result = e
+    assert check_selection_response(test_case, result)
+
 def main():
     print("🧭 ContextPilot Model Selection Fix Test")
     print("=" * 50)
@@ -103,42 +103,36 @@ def main():
     print()
     
     # Start backend
-    backend_process = start_backend()
-    if not backend_process:
+    if not get_backend(timeout=20, use_cache=reuse_requested(REUSE_FLAG in sys.argv[1:])):
         print("❌ Backend failed to start")
         return False
         
-    try:
-        success = test_model_selection()
+    success = asyncio.run(check_model_selection())
+    
+    if success:
+        print("\n🎉 SUCCESS! Model selection is now working correctly!")
+        print("\n✅ FIXES APPLIED:")
+        print("   • Replaced invalid 'gpt-5' with real model names")
+        print("   • Fixed parameter handling for newer models")  
+        print("   • Added model validation in backend")
+        print("   • Updated frontend model dropdown options")
+        
+        print("\n📱 WHAT YOU'LL SEE IN THE UI:")
+        print("   • Model dropdown shows real OpenAI models")
+        print("   • Selected model is actually used for responses")
+        print("   • Model name appears in message attribution badge")
+        print("   • Invalid models get helpful error messages")
+        
+        print("\n🔧 AVAILABLE MODELS:")
+        print("   • gpt-4o (Latest GPT-4 variant)")
+        print("   • gpt-4o-mini (Smaller, faster)")
+        print("   • gpt-4-turbo (High capability)")
+        print("   • gpt-4 (Classic)")
+        print("   • gpt-3.5-turbo (Fast, economical)")
+        
+    else:
+        print("\n❌ Some tests failed - check the output above")
         
-        if success:
-            print("\n🎉 SUCCESS! Model selection is now working correctly!")
-            print("\n✅ FIXES APPLIED:")
-            print("   • Replaced invalid 'gpt-5' with real model names")
-            print("   • Fixed parameter handling for newer models")  
-            print("   • Added model validation in backend")
-            print("   • Updated frontend model dropdown options")
-            
-            print("\n📱 WHAT YOU'LL SEE IN THE UI:")
-            print("   • Model dropdown shows real OpenAI models")
-            print("   • Selected model is actually used for responses")
-            print("   • Model name appears in message attribution badge")
-            print("   • Invalid models get helpful error messages")
-            
-            print("\n🔧 AVAILABLE MODELS:")
-            print("   • gpt-4o (Latest GPT-4 variant)")
-            print("   • gpt-4o-mini (Smaller, faster)")
-            print("   • gpt-4-turbo (High capability)")
-            print("   • gpt-4 (Classic)")
-            print("   • gpt-3.5-turbo (Fast, economical)")
-            
-        else:
-            print("\n❌ Some tests failed - check the output above")
-            
-    finally:
-        print("\n🛑 Stopping backend...")
-        backend_process.terminate()
-        backend_process.wait()
         
     return success
 